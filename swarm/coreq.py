@@ -1,9 +1,38 @@
 # Required imports
 import json
+import logging
+import os
+import queue
 import threading
 import time
+import zlib
+from collections import Counter
+from functools import partial
+from operator import attrgetter
 
 from swarm import Agent, Swarm
+from swarm.handler import RabbitMQHandler, decode_body
+
+# Pretty-printed message dumps are pure overhead on the hot path, so
+# they are opt-in via the SWARM_DEBUG environment variable
+DEBUG = os.environ.get("SWARM_DEBUG", "").lower() in ("1", "true", "yes")
+
+logger = logging.getLogger(__name__)
+
+# Precompiled Response -> dict adapter: the attribute walk is resolved
+# once here instead of field-by-field lookups per call
+_response_getter = attrgetter("messages", "agent", "context_variables")
+
+
+def serializable_response(response):
+    """JSON-safe dict view of a Response built by the precompiled getter."""
+    messages, agent, context_variables = _response_getter(response)
+    return {
+        "messages": messages,
+        "agent": agent.name if agent else None,
+        "context_variables": context_variables,
+    }
+
 
 DEFAULT_RABBITMQ_CONFIG = {
     "host": "localhost",
@@ -14,95 +43,661 @@ DEFAULT_RABBITMQ_CONFIG = {
 
 
 class SwarmRabbitMQ(Swarm):
-    def __init__(self, rabbitmq_config=DEFAULT_RABBITMQ_CONFIG):
-        """Initialize the SwarmMQ with RabbitMQ configuration."""
+    # Flush pending acks at least this often (seconds), even on small batches
+    ACK_FLUSH_INTERVAL = 0.2
+
+    def __init__(
+        self,
+        rabbitmq_config=DEFAULT_RABBITMQ_CONFIG,
+        prefetch_count=100,
+        ack_batch=None,
+        queue_shards=4,
+        queue_type="classic",
+        persistent=True,
+        use_msgpack=False,
+    ):
+        """Initialize the SwarmMQ with RabbitMQ configuration.
+
+        prefetch_count bounds how many unacked messages the broker pushes
+        to a consumer channel. Higher values hide broker round-trip latency;
+        very large values risk ack timeouts on slow handlers, so keep it in
+        the 50-100 range unless the workload says otherwise.
+
+        ack_batch is how many deliveries are acknowledged with a single
+        multiple=True ack frame. It defaults to prefetch_count so the
+        unacked window never exceeds the prefetch window.
+
+        queue_shards is the size of the shared queue pool agents are
+        hashed onto. Each queue is an Erlang process on the broker, so a
+        small pool scales better than one queue per agent; messages for
+        the agents sharing a shard are told apart by the to_agent field
+        in the message body.
+
+        queue_type selects the broker-side queue implementation:
+        "classic" (default) keeps messages in RAM, "lazy" pages bodies
+        to disk to free broker RAM, and "stream" uses disk-backed stream
+        queues whose linear-read pattern scales well past the tens of
+        thousands msg/s a classic queue tops out at (streams are always
+        persistent, and consumers need a prefetch, which this client
+        sets anyway).
+
+        persistent=False publishes transient (delivery_mode=1) messages
+        to non-durable queues, skipping the broker fsync per message for
+        swarm traffic that is cheap to re-run.
+
+        use_msgpack=True packs message bodies with msgpack (30-50%
+        smaller and cheaper to parse than JSON); only enable it once
+        every consumer in the fleet has the msgpack package installed.
+        """
         super().__init__()
         self.rabbitmq_config = rabbitmq_config
+        self.rabbitmq = RabbitMQHandler(
+            **rabbitmq_config, persistent=persistent, use_msgpack=use_msgpack
+        )
+        self.prefetch_count = prefetch_count
+        self.ack_batch = ack_batch or prefetch_count
+        self.queue_shards = queue_shards
+        self.queue_type = queue_type
+        if queue_type == "stream":
+            self.queue_arguments = {
+                "x-queue-type": "stream",
+                "x-max-length-bytes": 1_000_000_000,
+            }
+        elif queue_type == "lazy":
+            self.queue_arguments = {"x-queue-mode": "lazy"}
+        else:
+            self.queue_arguments = None
         self.agents = []
+        self.agent_queues = {}
+        self._senders = {}
+        self._declared_shards = set()
+        # Local publish/consume tallies back debug_queues() without
+        # per-call broker RPCs; the drained event flips as the tallies
+        # cross so callers can wait instead of polling
+        self._published = Counter()
+        self._consumed = Counter()
+        self._drained = threading.Event()
+        self._drained.set()
         self.consumer_threads = []
 
+    def _note_published(self, queue_name, n=1):
+        """Tally n publishes and mark the client as having work in flight.
+
+        Called before the messages are handed to the broker, so the
+        clear always precedes the matching _note_consumed calls; the
+        counter comparison keeps a tally that was already caught up
+        (e.g. after a racing consume) from leaving the event cleared.
+        """
+        self._published[queue_name] += n
+        if sum(self._published.values()) > sum(self._consumed.values()):
+            self._drained.clear()
+
+    def _unnote_published(self, queue_name, n=1):
+        """Roll back a publish tally after the publish itself failed."""
+        self._published[queue_name] -= n
+        if sum(self._consumed.values()) >= sum(self._published.values()):
+            self._drained.set()
+
+    def _note_consumed(self, queue_name, n=1):
+        """Tally n consumes; signal waiters once consumption catches up."""
+        self._consumed[queue_name] += n
+        if sum(self._consumed.values()) >= sum(self._published.values()):
+            self._drained.set()
+
+    def wait_until_drained(self, timeout=None):
+        """Block until every message this client published has been
+        consumed again, or timeout (seconds) elapses.
+
+        Event-driven companion to debug_queues(): consumers set the
+        event the moment the local tallies cross, so waiters wake at
+        drain time instead of on a polling interval. Returns True if
+        drained, False on timeout. Like the counters themselves, this
+        only sees this client's traffic.
+        """
+        return self._drained.wait(timeout)
+
+    def _shard_for(self, agent_name):
+        """Stable shard id for an agent name (str hash() is salted per
+        process, so crc32 keeps routing consistent across restarts)."""
+        return zlib.crc32(agent_name.encode()) % self.queue_shards
+
+    def _queue_for(self, agent):
+        """Shared shard queue that carries this agent's messages."""
+        cached = self.agent_queues.get(agent.name)
+        if cached:
+            return cached["queue_name"]
+        return f"agent_shard_{self._shard_for(agent.name)}_queue"
+
+    def _routing_key_for(self, agent):
+        """Routing key addressing one agent inside its shard."""
+        cached = self.agent_queues.get(agent.name)
+        if cached:
+            return cached["routing_key"]
+        return f"agent.{self._shard_for(agent.name)}.{agent.name}"
+
+    def _cache_agent(self, agent):
+        """Record an agent locally and return its shard id.
+
+        Idempotent: re-registering a name (e.g. a module re-import
+        sharing the client) refreshes the caches without duplicating
+        the agents list.
+        """
+        shard = self._shard_for(agent.name)
+        if agent.name not in self.agent_queues:
+            self.agents.append(agent)
+        # Cache the derived names so hot publish/consume paths skip the
+        # hash and string formatting on every message
+        self.agent_queues[agent.name] = {
+            "queue_name": f"agent_shard_{shard}_queue",
+            "routing_key": f"agent.{shard}.{agent.name}",
+        }
+        # Pre-bound publish closure: the routing key and publish callable
+        # are fixed per agent, so hot handoffs skip the dict chase and
+        # argument binding entirely
+        self._senders[agent.name] = partial(
+            self.rabbitmq.publish_message, f"agent.{shard}.{agent.name}"
+        )
+        return shard
+
     def register_agent(self, agent):
-        """Register an agent with the SwarmMQ."""
-        self.agents.append(agent)
-        print(f"Agent {agent.name} registered.")
+        """Register an agent with the SwarmMQ and bind its shard queue."""
+        shard = self._cache_agent(agent)
+        # queue_declare is idempotent when arguments match, so no passive
+        # probe is needed; agents sharing a shard also share its declare,
+        # so only the first registration per shard hits the broker
+        if shard not in self._declared_shards:
+            self.rabbitmq.setup_queue(
+                queue_name=self._queue_for(agent),
+                routing_key=f"agent.{shard}.*",
+                arguments=self.queue_arguments,
+            )
+            self._declared_shards.add(shard)
+        logger.info("Agent %s registered.", agent.name)
+
+    def register_agents(self, agents):
+        """Register many agents with one pipelined declare-then-bind burst.
+
+        All shard queues the batch needs are declared and bound through
+        setup_queues in roughly two broker round trips, instead of the
+        O(N) sequential RPCs of calling register_agent per agent.
+        """
+        bindings = {}
+        for agent in agents:
+            shard = self._cache_agent(agent)
+            if shard not in self._declared_shards:
+                bindings[f"agent_shard_{shard}_queue"] = f"agent.{shard}.*"
+                self._declared_shards.add(shard)
+        self.rabbitmq.setup_queues(
+            list(bindings.items()), arguments=self.queue_arguments
+        )
+        for agent in agents:
+            logger.info("Agent %s registered.", agent.name)
+
+    def start_consuming(
+        self,
+        agent,
+        callback,
+        batch_size=None,
+        batch_timeout_ms=100,
+        prefetch_count=None,
+        auto_ack=False,
+    ):
+        """Consume messages for an agent, dispatching to callback.
+
+        prefetch_count overrides the client-wide prefetch window for
+        this consumer; short handlers profit from a larger window.
+
+        auto_ack=True drops acknowledgements entirely (at-most-once
+        delivery): the broker forgets a message the moment it is sent,
+        removing the ack traffic for handlers that are idempotent or
+        side-effect-free.
+
+        Consumers deliberately stay non-exclusive: shard queues are
+        shared by every agent hashed to them, so an exclusive consumer
+        would lock out the other agents' consumers on the same shard.
+        For the same reason a per-agent consumer must not compete with
+        another agent's consumer on the shard: the broker round-robins
+        deliveries between them, and each would ack (destroy) the
+        shard-mate's messages its to_agent filter skips. When several
+        registered agents share the shard, consume for all of them with
+        start_consumers instead; this method logs a warning if it
+        detects that situation.
+
+        With the default batch_size=None, callback receives one decoded
+        message per call. Passing batch_size switches to the batch-worker
+        model: callback receives a list of up to batch_size messages,
+        flushed early after batch_timeout_ms of quiet, letting handlers
+        collapse downstream round trips and share one multi-ack.
+
+        The pika ioloop thread only feeds raw deliveries into a buffer
+        bounded to the prefetch window, so the next fetch stays in
+        flight while the handler works; decoding and callback run on a
+        separate worker thread, overlapping network reads with
+        processing (and keeping decode failures off the ioloop).
+
+        Deliveries are acknowledged in batches (self.ack_batch, or
+        batch_size when batching) with a single multiple=True ack,
+        falling back to a time-based flush so a quiet queue never holds
+        acks longer than the flush interval. A handler error never kills
+        the worker: the failed delivery is nacked (requeued on its first
+        attempt, dropped on redelivery so a poison message cannot loop),
+        batched mode requeues the whole unacked window, and consumption
+        continues. Acks are marshalled back onto the ioloop thread with
+        add_callback_threadsafe to stay pika-safe.
+
+        The consumer runs on its own pika.SelectConnection; the blocking
+        connection is kept for setup and publishing only.
+        """
+        batching = batch_size is not None
+        ack_boundary = batch_size if batching else self.ack_batch
+        flush_interval = (
+            batch_timeout_ms / 1000.0 if batching else self.ACK_FLUSH_INTERVAL
+        )
+        prefetch_count = prefetch_count or self.prefetch_count
+        buffer = queue.Queue(maxsize=prefetch_count)
+        queue_name = self._queue_for(agent)
+        shard_mates = [
+            other.name
+            for other in self.agents
+            if other.name != agent.name and self._queue_for(other) == queue_name
+        ]
+        if shard_mates:
+            logger.warning(
+                "Agent %s shares %s with %s; a per-agent consumer acks "
+                "the messages it skips, so shard-mates lose traffic. "
+                "Use start_consumers for all agents on the shard.",
+                agent.name,
+                queue_name,
+                ", ".join(shard_mates),
+            )
+
+        def on_delivery(ch, method, properties, body):
+            # pika thread: hand off only; decoding happens on the worker
+            # so a malformed or undecodable body is nacked there instead
+            # of killing the ioloop
+            buffer.put(
+                (ch, method.delivery_tag, method.redelivered, properties, body)
+            )
+
+        def ack_upto(ch, tag):
+            ch.connection.ioloop.add_callback_threadsafe(
+                lambda: ch.basic_ack(delivery_tag=tag, multiple=True)
+            )
+
+        def requeue_upto(ch, tag):
+            ch.connection.ioloop.add_callback_threadsafe(
+                lambda: ch.basic_nack(
+                    delivery_tag=tag, multiple=True, requeue=True)
+            )
+
+        def nack_one(ch, tag, requeue):
+            ch.connection.ioloop.add_callback_threadsafe(
+                lambda: ch.basic_nack(
+                    delivery_tag=tag, multiple=False, requeue=requeue)
+            )
+
+        def worker():
+            # A failing handler must never kill this thread: the ioloop
+            # keeps feeding the bounded buffer, and with no reader the
+            # next buffer.put would block the ioloop itself (stopping
+            # heartbeats). Errors settle the affected deliveries and the
+            # loop continues.
+            pending = 0  # deliveries not yet acked
+            batch = []  # decoded messages awaiting a batched callback
+            last_flush = time.monotonic()
+            ch = tag = None
+
+            def flush():
+                nonlocal pending, last_flush
+                if batching and batch:
+                    callback(list(batch))
+                    batch.clear()
+                if pending:
+                    if not auto_ack:
+                        ack_upto(ch, tag)
+                    pending = 0
+                last_flush = time.monotonic()
+
+            def drop_window():
+                # Requeue everything unacked (the failed dispatch plus
+                # any batched-but-undispatched messages) and start a
+                # fresh window
+                nonlocal pending, last_flush
+                if pending and not auto_ack:
+                    requeue_upto(ch, tag)
+                pending = 0
+                batch.clear()
+                last_flush = time.monotonic()
+
+            while True:
+                try:
+                    ch, tag, redelivered, properties, body = buffer.get(
+                        timeout=flush_interval)
+                except queue.Empty:
+                    try:
+                        if pending or batch:
+                            flush()
+                    except Exception:
+                        logger.exception(
+                            "Handler error on %s, requeueing window",
+                            queue_name,
+                        )
+                        drop_window()
+                    continue
+                pending += 1
+                try:
+                    message = decode_body(properties, body)
+                    # Shard queues are shared; only dispatch messages
+                    # addressed to this agent (unaddressed ones go to all)
+                    to_agent = message.get("to_agent")
+                    if to_agent is None or to_agent == agent.name:
+                        if batching:
+                            batch.append(message)
+                        else:
+                            callback(message)
+                    self._note_consumed(queue_name)
+                    if (
+                        pending >= ack_boundary
+                        or time.monotonic() - last_flush > flush_interval
+                    ):
+                        flush()
+                except Exception:
+                    logger.exception("Handler error on %s", queue_name)
+                    if batching:
+                        drop_window()
+                    else:
+                        # Settle the already-dispatched deliveries, then
+                        # nack just the failed one; a redelivered
+                        # failure is dropped instead of looping forever
+                        if not auto_ack:
+                            if pending > 1:
+                                ack_upto(ch, tag - 1)
+                            nack_one(ch, tag, requeue=not redelivered)
+                        pending = 0
+                        last_flush = time.monotonic()
+
+        worker_thread = threading.Thread(target=worker, daemon=True)
+        worker_thread.start()
+        consumer = self.rabbitmq.async_consume(
+            queue=queue_name,
+            on_message=on_delivery,
+            prefetch_count=prefetch_count,
+            auto_ack=auto_ack,
+        )
+        self.consumer_threads.append(consumer)
+        consumer.join()
+
+    def start_consumers(self, agents, callback, prefetch_count=None, auto_ack=False):
+        """Consume for many agents over one connection and one I/O thread.
+
+        Instead of a blocking consumer (and its OS thread) per agent,
+        every distinct shard queue the agents live on is consumed from a
+        single SelectConnection ioloop; a shared worker thread dispatches
+        messages whose to_agent matches one of the given agents
+        (unaddressed messages are dispatched as well). Acks are batched
+        as in start_consuming but tracked per channel, since each shard
+        queue is consumed on its own channel and delivery tags are
+        channel-scoped; auto_ack=True drops acks entirely for
+        at-most-once handlers. Blocks until the consumer stops.
+        """
+        prefetch_count = prefetch_count or self.prefetch_count
+        names = {agent.name for agent in agents}
+        queues = sorted({self._queue_for(agent) for agent in agents})
+        buffer = queue.Queue(maxsize=prefetch_count)
+
+        def on_delivery(ch, method, properties, body):
+            # Hand off only; decoding happens on the worker (see
+            # start_consuming)
+            buffer.put(
+                (
+                    ch,
+                    method.delivery_tag,
+                    method.redelivered,
+                    method.routing_key,
+                    properties,
+                    body,
+                )
+            )
+
+        def ack_upto(ch, tag):
+            ch.connection.ioloop.add_callback_threadsafe(
+                lambda: ch.basic_ack(delivery_tag=tag, multiple=True)
+            )
+
+        def nack_one(ch, tag, requeue):
+            ch.connection.ioloop.add_callback_threadsafe(
+                lambda: ch.basic_nack(
+                    delivery_tag=tag, multiple=False, requeue=requeue)
+            )
+
+        def worker():
+            # As in start_consuming, a failing handler must not kill the
+            # worker: with no buffer reader the ioloop would block on
+            # put() and heartbeats would stop, here for every agent at
+            # once. Errors settle the affected delivery and continue.
+            #
+            # Deliveries interleave from one channel per shard queue and
+            # delivery tags are channel-scoped, so the unacked window is
+            # tracked per channel (highest tag seen); every flush settles
+            # every channel, or a shard could sit on unacked deliveries
+            # until its prefetch window starved it permanently.
+            pending = {}  # channel -> highest unacked delivery tag
+            total = 0
+            last_flush = time.monotonic()
+
+            def flush_all():
+                nonlocal total, last_flush
+                if not auto_ack:
+                    for c, t in pending.items():
+                        ack_upto(c, t)
+                pending.clear()
+                total = 0
+                last_flush = time.monotonic()
+
+            while True:
+                try:
+                    (ch, tag, redelivered, routing_key, properties,
+                     body) = buffer.get(timeout=self.ACK_FLUSH_INTERVAL)
+                except queue.Empty:
+                    if pending:
+                        flush_all()
+                    continue
+                pending[ch] = tag
+                total += 1
+                try:
+                    message = decode_body(properties, body)
+                    to_agent = message.get("to_agent")
+                    if to_agent is None or to_agent in names:
+                        callback(message)
+                    # Routing keys are agent.{shard}.{name}; recover the
+                    # shard queue for the consume tally
+                    shard = routing_key.split(".", 2)[1]
+                    self._note_consumed(f"agent_shard_{shard}_queue")
+                except Exception:
+                    logger.exception("Handler error on %s", routing_key)
+                    if not auto_ack:
+                        # Settle the already-dispatched deliveries on
+                        # every channel (on the failed one, only below
+                        # the failed tag), then nack just the failure; a
+                        # redelivered failure is dropped instead of
+                        # looping forever
+                        for c, t in pending.items():
+                            if c is ch:
+                                if tag > 1:
+                                    ack_upto(c, tag - 1)
+                            else:
+                                ack_upto(c, t)
+                        nack_one(ch, tag, requeue=not redelivered)
+                    pending.clear()
+                    total = 0
+                    last_flush = time.monotonic()
+                    continue
+                if (
+                    total >= self.ack_batch
+                    or time.monotonic() - last_flush > self.ACK_FLUSH_INTERVAL
+                ):
+                    flush_all()
+
+        worker_thread = threading.Thread(target=worker, daemon=True)
+        worker_thread.start()
+        consumer = self.rabbitmq.async_consume_many(
+            queues,
+            on_message=on_delivery,
+            prefetch_count=prefetch_count,
+            auto_ack=auto_ack,
+        )
+        self.consumer_threads.append(consumer)
+        consumer.join()
 
     def start_consumer_for_agent(self, agent):
-        """Start a consumer thread for an agent."""
-        max_retries = 3
-        retry_count = 0
+        """Start a consumer for an agent, re-entering after failures.
 
-        while retry_count < max_retries:
+        Reconnection itself is pika's job: ConnectionParameters carries
+        connection_attempts/retry_delay, so transient broker blips heal
+        in sub-second time inside the library. This loop only re-enters
+        consumption once pika has given up: ioloop-thread failures are
+        re-raised out of consumer.join(), so start_consuming surfaces
+        them here instead of returning as if the consumer ended cleanly.
+        """
+        while True:
             try:
-                print(f"\n[INFO] Starting consumer for {agent.name}")
+                logger.info("Starting consumer for %s", agent.name)
                 self.start_consuming(agent, callback=self.message_handler)
                 break
             except Exception as e:
-                retry_count += 1
-                print(f"[ERROR] Consumer error for {agent.name}: {str(e)}")
-                if retry_count < max_retries:
-                    wait_time = retry_count * 5  # Exponential backoff
-                    print(
-                        f"[INFO] Retry {retry_count}/{max_retries} for {agent.name} in {wait_time} seconds..."
-                    )
-                    time.sleep(wait_time)
-                else:
-                    print(f"[ERROR] Max retries reached for {agent.name}")
-                    break
+                logger.error(
+                    "Consumer error for %s, restarting: %s", agent.name, e
+                )
 
     def message_handler(self, message):
         """Handle received messages."""
-        print("\n=== Message Received ===")
-        print(f"Content: {json.dumps(message, indent=2)}")
+        logger.debug("Message received")
+        if DEBUG:
+            logger.debug("Content: %s", json.dumps(message, indent=2))
 
         if "messages" in message:
             for msg in message["messages"]:
                 if msg["role"] == "user":
-                    print(f"\nProcessing user message: {msg['content']}")
+                    logger.info("Processing user message: %s", msg["content"])
                     # Add your message processing logic here
 
-        if "context_variables" in message:
-            print(
-                f"\nContext variables: {json.dumps(message['context_variables'], indent=2)}"
+        if DEBUG and "context_variables" in message:
+            logger.debug(
+                "Context variables: %s",
+                json.dumps(message["context_variables"], indent=2),
+            )
+
+    def handoff_many(self, sender, receiver, payloads):
+        """Hand off several message payloads to one agent as a single
+        confirmed publish batch."""
+        routing_key = self._routing_key_for(receiver)
+        for payload in payloads:
+            payload.setdefault("from_agent", sender.name)
+            payload.setdefault("to_agent", receiver.name)
+        # Tally before the broker handoff: consumers may tally the
+        # consume before publish_batch returns
+        queue_name = self._queue_for(receiver)
+        self._note_published(queue_name, len(payloads))
+        try:
+            self.rabbitmq.publish_batch(
+                [(routing_key, payload) for payload in payloads]
+            )
+        except Exception:
+            self._unnote_published(queue_name, len(payloads))
+            raise
+        return {"status": "success", "message": f"{len(payloads)} handoffs queued"}
+
+    def debug_queues(self):
+        """Snapshot of per-queue traffic from local counters.
+
+        Counting publishes and consumes client-side keeps this free of
+        broker RPCs, so callers can poll it on the hot path; the figures
+        cover this client's traffic only.
+        """
+        return {
+            queue_name: {
+                "message_count": max(
+                    self._published[queue_name] - self._consumed[queue_name], 0
+                ),
+                "published": self._published[queue_name],
+                "consumed": self._consumed[queue_name],
+            }
+            for queue_name in set(self._published) | set(self._consumed)
+        }
+
+    def run_batch(self, agent, message_lists, context_variables=None):
+        """Queue several message payloads for one agent in a single
+        confirmed publish window.
+
+        Each entry in message_lists is a messages list as accepted by
+        run(). All payloads are published back-to-back and the broker
+        confirms settle once at the end, so N sends cost about one round
+        trip instead of one per payload.
+        """
+        context_variables = context_variables or {}
+        routing_key = self._routing_key_for(agent)
+        items = [
+            (
+                routing_key,
+                {
+                    "to_agent": agent.name,
+                    "messages": messages,
+                    "context_variables": context_variables,
+                },
             )
+            for messages in message_lists
+        ]
+        # Tally before the broker handoff: consumers may tally the
+        # consume before publish_batch returns
+        queue_name = self._queue_for(agent)
+        self._note_published(queue_name, len(items))
+        try:
+            self.rabbitmq.publish_batch(items)
+        except Exception:
+            self._unnote_published(queue_name, len(items))
+            raise
+        return {"status": "success", "message": f"{len(items)} runs queued"}
 
     def handoff_to_agent(self, sender, receiver, messages, context):
         """Handoff message from one agent to another."""
+        queue_name = self._queue_for(receiver)
+        self._note_published(queue_name)
         try:
-            print(f"Handoff from {sender.name} to {receiver.name}")
-            # Implement the handoff logic here
+            logger.info("Handoff from %s to %s", sender.name, receiver.name)
+            self._senders[receiver.name](
+                {
+                    "from_agent": sender.name,
+                    "to_agent": receiver.name,
+                    "messages": messages,
+                    "context_variables": context,
+                }
+            )
             return {"status": "success", "message": "Handoff completed"}
         except Exception as e:
-            print(f"[ERROR] Failed to handoff: {str(e)}")
+            self._unnote_published(queue_name)
+            logger.error("Failed to handoff: %s", e)
             return {"status": "failure", "message": str(e)}
 
+    def close(self):
+        """Close the underlying RabbitMQ connection."""
+        self.rabbitmq.close()
 
-def run(self, agent, messages, context_variables=None):
-    """Run the agent with provided messages."""
-    context_variables = context_variables or {}
-    print("\n=== Sending Messages ===")
-    try:
-        # Assuming `super().run()` returns a Response object with accessible attributes
-        response = super().run(agent, messages, context_variables=context_variables)
-
-        # Accessing attributes directly from the Response object
-        serializable_response = {
-            "agent": str(getattr(response, "agent", "")),
-            "status": str(getattr(response, "status", "")),
-            "message_count": int(getattr(response, "message_count", 0)),
-            "final_message": str(getattr(response, "final_message", "")),
-            "context": getattr(response, "context", {}),
-        }
-
-        print(f"Run response: {json.dumps(serializable_response, indent=2)}")
-        return serializable_response
-    except Exception as e:
-        print(f"[ERROR] Failed to process response: {str(e)}")
-        return None
+    def run(self, agent, messages, context_variables=None, **kwargs):
+        """Run the agent with provided messages.
 
-    def start_consuming(self, agent, callback):
-        """Mocked function to simulate start consuming messages."""
-        # In a real-world scenario, this method would connect to RabbitMQ and consume messages.
-        print(f"Consuming messages for agent {agent.name}")
+        Returns the Response object unchanged; callers that need a dict
+        can use response.model_dump().
+        """
+        context_variables = context_variables or {}
+        response = super().run(
+            agent, messages, context_variables=context_variables, **kwargs
+        )
+        if DEBUG:
+            logger.debug(
+                "Run response: %s",
+                json.dumps(serializable_response(response), indent=2),
+            )
+        return response
 
 
 # Example RabbitMQ configuration
@@ -115,7 +710,7 @@ rabbitmq_config = {
 
 # Example usage
 if __name__ == "__main__":
-    client = SwarmMQ(rabbitmq_config=rabbitmq_config)
+    client = SwarmRabbitMQ(rabbitmq_config=rabbitmq_config)
     agent_a = Agent(name="Agent A", role="Sender")
     agent_b = Agent(name="Agent B", role="Receiver")
 
@@ -131,5 +726,6 @@ if __name__ == "__main__":
 
     time.sleep(1)  # Wait for consumers to start
     test_messages = [{"role": "user", "content": "I want to talk to agent B."}]
-    context = {"conversation_id": "test_123", "timestamp": time.time()}
+    # Integer nanosecond timestamps serialize faster than floats
+    context = {"conversation_id": "test_123", "timestamp": time.time_ns()}
     client.run(agent_a, test_messages, context_variables=context)
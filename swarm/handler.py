@@ -1,21 +1,288 @@
 import json
 import logging
+import threading
+import zlib
+from concurrent.futures import Future
 from functools import wraps
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 import pika
 
+try:
+    # orjson is several times faster than stdlib json on dict payloads
+    # and emits bytes directly, skipping the str->bytes encode
+    import orjson
+
+    def json_dumps(obj) -> bytes:
+        return orjson.dumps(obj)
+
+    json_loads = orjson.loads
+except ImportError:  # stdlib fallback keeps orjson an optional speedup
+    def json_dumps(obj) -> bytes:
+        return json.dumps(obj).encode()
+
+    json_loads = json.loads
+
+try:
+    # msgpack bodies are 30-50% smaller than JSON for the short control
+    # messages agents exchange and cheaper to parse on the consumer.
+    # Publishing it is opt-in (use_msgpack=True) so a publisher never
+    # surprises peers that lack the package; any consumer with msgpack
+    # installed can decode it via the content_type marker
+    import msgpack
+
+    def msgpack_dumps(obj) -> bytes:
+        return msgpack.packb(obj, use_bin_type=True)
+
+    def msgpack_loads(body):
+        return msgpack.unpackb(body, raw=False)
+
+except ImportError:  # optional, like orjson; JSON remains the fallback
+    msgpack_dumps = None
+    msgpack_loads = None
+
+MSGPACK_TYPE = "application/msgpack"
+
+
+# Single shared topic exchange for all agent traffic; every declare,
+# bind, and publish goes through this one name
+AGENT_EXCHANGE = "agent_exchange"
+
+# Shared across publishes; building a BasicProperties per message is
+# avoidable allocation on the hot path
+PERSISTENT_DELIVERY = pika.BasicProperties(delivery_mode=2)
+TRANSIENT_DELIVERY = pika.BasicProperties(delivery_mode=1)
+PERSISTENT_DEFLATE = pika.BasicProperties(
+    delivery_mode=2, content_encoding="deflate")
+TRANSIENT_DEFLATE = pika.BasicProperties(
+    delivery_mode=1, content_encoding="deflate")
+PERSISTENT_MSGPACK = pika.BasicProperties(
+    delivery_mode=2, content_type=MSGPACK_TYPE)
+TRANSIENT_MSGPACK = pika.BasicProperties(
+    delivery_mode=1, content_type=MSGPACK_TYPE)
+PERSISTENT_MSGPACK_DEFLATE = pika.BasicProperties(
+    delivery_mode=2, content_type=MSGPACK_TYPE, content_encoding="deflate")
+TRANSIENT_MSGPACK_DEFLATE = pika.BasicProperties(
+    delivery_mode=1, content_type=MSGPACK_TYPE, content_encoding="deflate")
+
+# Bodies above this size are worth compressing before they hit the wire
+COMPRESS_THRESHOLD = 1024
+
+
+def decode_body(properties, body):
+    """Decompress and deserialize per the body's AMQP properties.
+
+    content_encoding marks deflated bodies and content_type marks
+    msgpack ones, so consumers decode whatever a peer publishes
+    regardless of which optional codecs either side has installed.
+    """
+    if properties is not None and properties.content_encoding == "deflate":
+        body = zlib.decompress(body)
+    if properties is not None and properties.content_type == MSGPACK_TYPE:
+        if msgpack_loads is None:
+            raise RuntimeError(
+                "Received a msgpack body but msgpack is not installed"
+            )
+        return msgpack_loads(body)
+    return json_loads(body)
+
+
+class AsyncPublisher:
+    """Publisher with asynchronous broker confirms.
+
+    A blocking channel with confirms enabled waits one full broker round
+    trip per basic_publish. Here publishes are funneled onto a
+    SelectConnection ioloop, confirms arrive on a single ack/nack
+    callback, and each publish returns a Future resolved when its
+    delivery tag (or a multiple=True confirm covering it) comes back, so
+    N publishes stay in flight at once.
+    """
+
+    def __init__(self, parameters, properties=None, exchange=AGENT_EXCHANGE):
+        self._properties = properties
+        self._exchange = exchange
+        self._channel = None
+        self._ready = threading.Event()
+        self._error = None
+        self._next_tag = 0
+        self._pending = {}  # delivery_tag -> Future
+        self._lock = threading.Lock()
+        self._connection = pika.SelectConnection(
+            parameters,
+            on_open_callback=self._on_connection_open,
+            on_open_error_callback=self._on_open_error,
+            on_close_callback=self._on_connection_closed,
+        )
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        try:
+            self._connection.ioloop.start()
+        except Exception as e:
+            self._fail(e)
+
+    def _fail(self, error):
+        """Mark the publisher dead: wake waiters, fail pending futures.
+
+        Without this, an unreachable broker left _ready forever unset
+        (publish blocked indefinitely) and a mid-flight connection loss
+        left confirmed-pending futures unresolved.
+        """
+        if not isinstance(error, Exception):
+            error = pika.exceptions.AMQPConnectionError(error)
+        with self._lock:
+            self._error = error
+            pending, self._pending = self._pending, {}
+        for future in pending.values():
+            future.set_exception(error)
+        self._ready.set()
+
+    @property
+    def dead(self):
+        """True once the publisher has failed and cannot publish again."""
+        return self._error is not None
+
+    def _on_open_error(self, connection, error):
+        self._fail(error)
+        connection.ioloop.stop()
+
+    def _on_connection_closed(self, connection, reason):
+        self._fail(reason)
+
+    def _on_connection_open(self, connection):
+        connection.channel(on_open_callback=self._on_channel_open)
+
+    def _on_channel_open(self, channel):
+        channel.confirm_delivery(ack_nack_callback=self._on_confirm)
+        self._channel = channel
+        self._ready.set()
+
+    def _on_confirm(self, method_frame):
+        method = method_frame.method
+        tag = method.delivery_tag
+        nacked = isinstance(method, pika.spec.Basic.Nack)
+        with self._lock:
+            if method.multiple:
+                tags = [t for t in self._pending if t <= tag]
+            else:
+                tags = [tag] if tag in self._pending else []
+            futures = [self._pending.pop(t) for t in tags]
+        for future in futures:
+            if nacked:
+                future.set_exception(
+                    RuntimeError(f"Broker nacked delivery {tag}"))
+            else:
+                future.set_result(True)
+
+    def publish(self, routing_key: str, body: bytes, properties=None) -> Future:
+        """Queue one publish; the returned Future resolves on confirm.
+
+        Raises the recorded connection error instead of blocking when
+        the publisher is dead (failed to connect, or closed mid-flight).
+        """
+        self._ready.wait()
+        future = Future()
+        with self._lock:
+            if self._error is not None:
+                raise self._error
+            # Tag assignment and enqueueing share the lock so tags track
+            # the channel's publish order across threads
+            self._next_tag += 1
+            self._pending[self._next_tag] = future
+            self._connection.ioloop.add_callback_threadsafe(
+                lambda: self._channel.basic_publish(
+                    exchange=self._exchange,
+                    routing_key=routing_key,
+                    body=body,
+                    properties=properties or self._properties,
+                )
+            )
+        return future
+
+
+class _IoloopThread(threading.Thread):
+    """Daemon thread driving a SelectConnection ioloop.
+
+    Failures on the ioloop thread (connection open errors, crashes in
+    ioloop.start) are recorded and re-raised to whoever joins the
+    thread, so a consumer blocked in join() observes them instead of
+    returning as if consumption ended cleanly.
+    """
+
+    def __init__(self, target):
+        super().__init__(target=target, daemon=True)
+        self.error = None
+
+    def join(self, timeout=None):
+        super().join(timeout)
+        if self.error is not None and not self.is_alive():
+            raise self.error
+
 
 class RabbitMQHandler:
     """Handler for RabbitMQ communications in Swarm system"""
 
-    def __init__(self, host="localhost", port=5672, username="guest", password="guest"):
+    def __init__(
+        self,
+        host="localhost",
+        port=5672,
+        username="guest",
+        password="guest",
+        persistent=True,
+        use_msgpack=False,
+    ):
         self.credentials = pika.PlainCredentials(username, password)
+        # Let pika handle transient hiccups itself (heartbeats plus a
+        # few quick connect retries) instead of sleep-and-rebuild loops
+        # higher up the stack
         self.parameters = pika.ConnectionParameters(
-            host=host, port=port, credentials=self.credentials
+            host=host,
+            port=port,
+            credentials=self.credentials,
+            heartbeat=30,
+            blocked_connection_timeout=60,
+            connection_attempts=5,
+            retry_delay=0.5,
         )
+        # Persistent delivery forces a broker fsync per message; for
+        # ephemeral chat-like traffic where a replay is cheap, transient
+        # delivery skips that cost entirely
+        self.persistent = persistent
+        # msgpack on the wire is opt-in: every consumer of these
+        # messages must have the package, so installing it on the
+        # publisher alone must not switch the format. The properties
+        # carry content_type so consumers pick the matching decoder.
+        if use_msgpack:
+            if msgpack_dumps is None:
+                raise ImportError(
+                    "use_msgpack=True requires the msgpack package"
+                )
+            self._dumps = msgpack_dumps
+            self.publish_properties = (
+                PERSISTENT_MSGPACK if persistent else TRANSIENT_MSGPACK
+            )
+            self.compressed_properties = (
+                PERSISTENT_MSGPACK_DEFLATE
+                if persistent
+                else TRANSIENT_MSGPACK_DEFLATE
+            )
+        else:
+            self._dumps = json_dumps
+            self.publish_properties = (
+                PERSISTENT_DELIVERY if persistent else TRANSIENT_DELIVERY
+            )
+            self.compressed_properties = (
+                PERSISTENT_DEFLATE if persistent else TRANSIENT_DEFLATE
+            )
         self.connection = None
         self.channel = None
+        # pika channels are not thread-safe; give each producer thread
+        # its own connection+channel so publishes are not serialized
+        self._local = threading.local()
+        self._exchange_declared = False
+        self._async_publisher = None
+        self._async_publisher_lock = threading.Lock()
         self._connect()
 
     def _connect(self):
@@ -23,10 +290,16 @@ class RabbitMQHandler:
         try:
             self.connection = pika.BlockingConnection(self.parameters)
             self.channel = self.connection.channel()
-            # Declare exchange for agent communication
-            self.channel.exchange_declare(
-                exchange="agent_exchange", exchange_type="topic"
-            )
+            # Declare exchange for agent communication; the broker keeps
+            # a durable exchange across restarts, so one declare per
+            # process is enough and reconnects skip the RPC
+            if not self._exchange_declared:
+                self.channel.exchange_declare(
+                    exchange=AGENT_EXCHANGE, exchange_type="topic", durable=True
+                )
+                self._exchange_declared = True
+            self._local.connection = self.connection
+            self._local.channel = self.channel
         except Exception as e:
             logging.error(f"Failed to connect to RabbitMQ: {str(e)}")
             raise
@@ -38,34 +311,251 @@ class RabbitMQHandler:
         def wrapper(self, *args, **kwargs):
             if not self.connection or self.connection.is_closed:
                 self._connect()
+            elif not self.channel or self.channel.is_closed:
+                # Connection survived, only the channel dropped; reopen
+                # it cheaply instead of rebuilding the whole socket
+                self.channel = self.connection.channel()
             return func(self, *args, **kwargs)
 
         return wrapper
 
-    @ensure_connection
+    def _publish_channel(self):
+        """Publish channel owned by the calling thread.
+
+        Opened lazily per thread (and reopened if closed), so concurrent
+        producers publish in parallel instead of contending on the one
+        shared channel.
+        """
+        channel = getattr(self._local, "channel", None)
+        if channel is None or not channel.is_open:
+            connection = pika.BlockingConnection(self.parameters)
+            channel = connection.channel()
+            self._local.connection = connection
+            self._local.channel = channel
+        return channel
+
+    def _encode(self, message: Dict[str, Any]):
+        """Serialize a message, compressing large bodies.
+
+        deflate at a low level compresses far faster than typical broker
+        network throughput, so shrinking >1 KiB handoff payloads is a
+        net win on the network/disk-bound publish path. Returns the body
+        together with the matching BasicProperties.
+        """
+        body = self._dumps(message)
+        if len(body) > COMPRESS_THRESHOLD:
+            return zlib.compress(body, 3), self.compressed_properties
+        return body, self.publish_properties
+
     def publish_message(self, routing_key: str, message: Dict[str, Any]):
         """Publish message to specific routing key"""
         try:
-            self.channel.basic_publish(
-                exchange="agent_exchange",
+            body, properties = self._encode(message)
+            self._publish_channel().basic_publish(
+                exchange=AGENT_EXCHANGE,
                 routing_key=routing_key,
-                body=json.dumps(message),
-                properties=pika.BasicProperties(
-                    delivery_mode=2,  # make message persistent
-                ),
+                body=body,
+                properties=properties,
             )
         except Exception as e:
             logging.error(f"Failed to publish message: {str(e)}")
             raise
 
+    def publish_message_async(self, routing_key: str, message: Dict[str, Any]) -> Future:
+        """Publish without waiting for the broker confirm.
+
+        Returns a Future resolved when the confirm arrives; callers
+        fanning out a batch can publish them all and wait once at the
+        end (concurrent.futures.wait) instead of paying a round trip
+        per message.
+        """
+        with self._async_publisher_lock:
+            # Respawn a publisher that died (broker unreachable or the
+            # connection dropped) so one outage does not poison every
+            # later publish with the stale error
+            if self._async_publisher is None or self._async_publisher.dead:
+                self._async_publisher = AsyncPublisher(
+                    self.parameters, properties=self.publish_properties
+                )
+        body, properties = self._encode(message)
+        return self._async_publisher.publish(routing_key, body, properties)
+
+    def publish_batch(self, items: List[Tuple[str, Dict[str, Any]]]):
+        """Publish a batch of (routing_key, message) pairs with one
+        confirmed window.
+
+        All items go through the async confirm channel back-to-back, so
+        the whole batch stays in flight at once and the broker's
+        (typically multiple=True) confirms settle it together; the call
+        waits once at the end instead of a round trip per item, and
+        raises if the broker nacked any delivery.
+        """
+        try:
+            futures = [
+                self.publish_message_async(routing_key, message)
+                for routing_key, message in items
+            ]
+            for future in futures:
+                future.result()
+        except Exception as e:
+            logging.error(f"Failed to publish batch: {str(e)}")
+            raise
+
     @ensure_connection
-    def setup_queue(self, queue_name: str, routing_key: str):
+    def setup_queue(
+        self,
+        queue_name: str,
+        routing_key: str,
+        arguments: Optional[Dict[str, Any]] = None,
+    ):
         """Setup queue and bind it to the exchange"""
-        self.channel.queue_declare(queue=queue_name, durable=True)
+        self.channel.queue_declare(
+            queue=queue_name, durable=self.persistent, arguments=arguments
+        )
         self.channel.queue_bind(
-            exchange="agent_exchange", queue=queue_name, routing_key=routing_key
+            exchange=AGENT_EXCHANGE, queue=queue_name, routing_key=routing_key
+        )
+
+    def setup_queues(
+        self,
+        bindings: List[Tuple[str, str]],
+        arguments: Optional[Dict[str, Any]] = None,
+    ):
+        """Declare and bind many queues in one pipelined burst.
+
+        bindings is a list of (queue_name, routing_key) pairs. All
+        declares are issued back-to-back on a dedicated SelectConnection
+        channel, then all binds, then the replies drain together — about
+        two round trips total instead of one per queue.
+        """
+        bindings = list(bindings)
+        if not bindings:
+            return
+        done = threading.Event()
+        remaining = [len(bindings) * 2]
+        errors = []
+
+        def one_done(_frame):
+            remaining[0] -= 1
+            if remaining[0] == 0:
+                done.set()
+
+        def on_channel_open(channel):
+            for queue_name, _ in bindings:
+                channel.queue_declare(
+                    queue=queue_name,
+                    durable=self.persistent,
+                    arguments=arguments,
+                    callback=one_done,
+                )
+            for queue_name, routing_key in bindings:
+                channel.queue_bind(
+                    exchange=AGENT_EXCHANGE,
+                    queue=queue_name,
+                    routing_key=routing_key,
+                    callback=one_done,
+                )
+
+        def on_connection_open(connection):
+            connection.channel(on_open_callback=on_channel_open)
+
+        def on_open_error(connection, error):
+            if not isinstance(error, Exception):
+                error = pika.exceptions.AMQPConnectionError(error)
+            errors.append(error)
+            done.set()
+            connection.ioloop.stop()
+
+        connection = pika.SelectConnection(
+            self.parameters,
+            on_open_callback=on_connection_open,
+            on_open_error_callback=on_open_error,
+        )
+        thread = threading.Thread(target=connection.ioloop.start, daemon=True)
+        thread.start()
+        # Registration must not "succeed" with the queues undeclared:
+        # publishes to unbound routing keys are silently unroutable
+        finished = done.wait(timeout=10)
+        if errors:
+            raise errors[0]
+        if not finished:
+            connection.ioloop.add_callback_threadsafe(connection.close)
+            raise RuntimeError(
+                f"Timed out declaring {len(bindings)} queues "
+                f"({remaining[0]} broker replies outstanding)"
+            )
+        connection.ioloop.add_callback_threadsafe(connection.close)
+
+    def async_consume(
+        self, queue: str, on_message, prefetch_count: int = 0, auto_ack: bool = False
+    ):
+        """Consume a queue on a SelectConnection running in its own thread.
+
+        Unlike BlockingConnection, SelectConnection pipelines socket reads
+        with callback dispatch, so acks issued from on_message never stall
+        the read loop. The blocking connection stays dedicated to setup
+        and publishing. Returns the daemon thread driving the ioloop.
+        """
+        return self.async_consume_many(
+            [queue], on_message, prefetch_count, auto_ack
         )
 
+    def async_consume_many(
+        self,
+        queues: List[str],
+        on_message,
+        prefetch_count: int = 0,
+        auto_ack: bool = False,
+    ):
+        """Consume several queues on one SelectConnection.
+
+        All consumers share a single ioloop thread, so N queues cost one
+        OS thread and one connection instead of one each. Each queue
+        still gets its own channel: the broker orders deliveries per
+        channel, so a shared channel would serialize dispatch across
+        queues, while per-queue channels let deliveries for busy and
+        idle agents flow independently (and basic_qos apply per
+        consumer). Channels are cheap multiplexed frames on the one
+        socket. Returns the daemon thread driving the ioloop.
+        """
+
+        def consume_on(queue):
+            def on_channel_open(channel):
+                if prefetch_count:
+                    channel.basic_qos(
+                        prefetch_count=prefetch_count, global_qos=False)
+                channel.basic_consume(
+                    queue=queue, on_message_callback=on_message, auto_ack=auto_ack
+                )
+
+            return on_channel_open
+
+        def on_connection_open(connection):
+            for queue in queues:
+                connection.channel(on_open_callback=consume_on(queue))
+
+        def on_open_error(connection, error):
+            if not isinstance(error, Exception):
+                error = pika.exceptions.AMQPConnectionError(error)
+            thread.error = error
+            connection.ioloop.stop()
+
+        connection = pika.SelectConnection(
+            self.parameters,
+            on_open_callback=on_connection_open,
+            on_open_error_callback=on_open_error,
+        )
+
+        def run():
+            try:
+                connection.ioloop.start()
+            except Exception as e:
+                thread.error = e
+
+        thread = _IoloopThread(run)
+        thread.start()
+        return thread
+
     def close(self):
         """Close RabbitMQ connection"""
         if self.connection and not self.connection.is_closed:
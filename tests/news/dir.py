@@ -1,23 +1,15 @@
 import logging
 
 from duck import search_news
-from models import model_list
-from newsq import article_writer, news_gatherer, publisher
+from newsq import (MODEL_NAME, article_writer, client, news_gatherer,
+                   publisher)
 from prompts import *
 
-from swarm import Agent, SwarmRabbitMQ
+from swarm import Agent
 
 # Configure minimal logging
 logging.basicConfig(level=logging.WARNING)
 
-# Initialize SwarmRabbitMQ client
-client = SwarmRabbitMQ()
-
-QWEN7 = 2
-LLAMA7 = 0
-GPT = 10
-MODEL = LLAMA7
-
 print("\n=== News Director AI System ===")
 print("Type 'quit' to exit\n")
 
@@ -37,16 +29,18 @@ def publish_article(article=None):
     return publisher
 
 
-news_director = Agent(
-    name="NewsDirector",
-    model=model_list[MODEL],
-    instructions="""You are a News Director responsible for:
+_INSTR_DIRECT = """You are a News Director responsible for:
     1. Deciding what topics to cover
     2. Coordinating the news gathering and writing process
     3. Ensuring high-quality content
     4. Managing the publication workflow
     
-    Provide clear instructions about what news to gather and what angle to take.""",
+    Provide clear instructions about what news to gather and what angle to take."""
+
+news_director = Agent(
+    name="NewsDirector",
+    model=MODEL_NAME,
+    instructions=_INSTR_DIRECT,
     functions=[search_news_agent, write_article, publish_article],
 )
 
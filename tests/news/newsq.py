@@ -1,5 +1,6 @@
 import logging
-import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 from duck import search_news
 from models import model_list
@@ -21,86 +22,131 @@ LLAMA7 = 0
 GPT = 10
 MODEL = LLAMA7
 
-# Define the worker agents
-news_gatherer = Agent(
-    name="NewsGatherer",
-    model=model_list[MODEL],
-    instructions="""You are a News Researcher who:
+# Resolve the model once and keep instruction strings as constants, so
+# importers (dir.py, harnesses) get plain name lookups instead of
+# re-indexing model_list and re-allocating the multi-line strings
+MODEL_NAME = model_list[MODEL]
+
+_INSTR_GATHER = """You are a News Researcher who:
     1. Takes a topic or query
     2. Uses the search_news function to gather relevant information
     3. Analyzes and summarizes the findings
     4. Provides structured data for the article writer
     
-    Always verify sources and collect multiple perspectives.""",
-    functions=[search_news],
-)
+    Always verify sources and collect multiple perspectives."""
 
-article_writer = Agent(
-    name="ArticleWriter",
-    model=model_list[MODEL],
-    instructions="""You are a Professional Writer who:
+_INSTR_WRITE = """You are a Professional Writer who:
     1. Takes researched information
     2. Creates engaging, well-structured articles
     3. Maintains journalistic standards
     4. Produces SEO-friendly content
     
-    Write in AP style and ensure factual accuracy.""",
-)
+    Write in AP style and ensure factual accuracy."""
 
-publisher = Agent(
-    name="Publisher",
-    model=model_list[MODEL],
-    instructions="""You are a Content Publisher who:
+_INSTR_PUBLISH = """You are a Content Publisher who:
     1. Takes the final article
     2. Formats it for WordPress
     3. Adds appropriate tags and categories
     4. Handles the publication process
     
-    Ensure proper formatting and metadata.""",
+    Ensure proper formatting and metadata."""
+
+# Define the worker agents
+news_gatherer = Agent(
+    name="NewsGatherer",
+    model=MODEL_NAME,
+    instructions=_INSTR_GATHER,
+    functions=[search_news],
+)
+
+article_writer = Agent(
+    name="ArticleWriter",
+    model=MODEL_NAME,
+    instructions=_INSTR_WRITE,
 )
 
-# Register agents with the client
+publisher = Agent(
+    name="Publisher",
+    model=MODEL_NAME,
+    instructions=_INSTR_PUBLISH,
+)
+
+# Register agents with the client; registration is idempotent, so
+# importers of this module (dir.py) can share the client freely
 logger.info("Registering agents...")
-client.register_agent(news_gatherer)
-logger.info(f"Agent {news_gatherer.name} registered")
-client.register_agent(article_writer)
-logger.info(f"Agent {article_writer.name} registered")
-client.register_agent(publisher)
-logger.info(f"Agent {publisher.name} registered")
+client.register_agents([news_gatherer, article_writer, publisher])
+logger.info("Agents registered")
+
+
+# All consumers share one pool for LLM calls: a synchronous client.run
+# inside the consumer thread would block that consumer for the whole
+# completion, so handlers only marshal work here and go straight back
+# to reaping deliveries while up to 16 runs proceed in parallel.
+_llm_pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix="llm-run")
+
+
+_agents_by_name = {
+    agent.name: agent for agent in (news_gatherer, article_writer, publisher)
+}
+
+
+def handle_message(message):
+    """Dispatch a delivery to the agent it is addressed to.
+
+    Deliveries arrive via basic_consume the moment the broker has them,
+    replacing the old receive_message polling and its 1-second latency
+    floor; acks are handled by start_consumers. The LLM call runs on
+    the shared pool, so an in-flight run is acked before it completes
+    (at-most-once for the run itself).
+    """
+    agent = _agents_by_name.get(message.get("to_agent"))
+    if agent is None:
+        logger.warning("Dropping message for unknown agent: %s",
+                       message.get("to_agent"))
+        return
+
+    def on_done(future):
+        try:
+            response = future.result()
+        except Exception as e:
+            logger.error("Run failed for %s: %s", agent.name, e)
+            return
+        print(f"\nResponse from {agent.name}:")
+        print(f"{'='*50}")
+        print(response.messages[-1]["content"][:200])
+        print(f"{'='*50}\n")
+
+    messages = message.get("messages") or [
+        {"role": "user", "content": str(message)}
+    ]
+    print(f"\n{'='*50}")
+    print(f"Message received for {agent.name}")
+    print(f"{'='*50}")
+
+    # Hand the completion off; the consumer thread is free again
+    future = _llm_pool.submit(client.run, agent=agent, messages=messages)
+    future.add_done_callback(on_done)
 
 
 if __name__ == "__main__":
     print("\nStarting News Agents System...")
     print("Waiting for tasks. Press Ctrl+C to exit.\n")
 
-    try:
-        while True:
-            # Check for messages in the queue
-            for agent in [news_gatherer, article_writer, publisher]:
-                try:
-                    # Try to get a message from the queue
-                    message = client.receive_message(agent.name)
-                    if message:
-                        print(f"\n{'='*50}")
-                        print(f"Message received for {agent.name}:")
-                        print(f"Content: {message[:200]}...")
-                        print(f"{'='*50}")
-
-                        # Process the message
-                        response = client.run(
-                            agent=agent, messages=[{"role": "user", "content": message}]
-                        )
-
-                        print(f"\nResponse from {agent.name}:")
-                        print(f"{'='*50}")
-                        print(response.messages[-1]["content"][:200])
-                        print(f"{'='*50}\n")
-                except Exception as e:
-                    if "no attribute 'receive_message'" not in str(e):
-                        print(f"Error processing messages for {agent.name}: {e}")
-
-            time.sleep(1)  # Wait a second before checking again
+    # One consumer over all agents: per-agent consumers would compete on
+    # shared shard queues (NewsGatherer and Publisher hash to the same
+    # shard) and ack each other's round-robinned messages away
+    consumer_thread = threading.Thread(
+        target=client.start_consumers,
+        args=([news_gatherer, article_writer, publisher], handle_message),
+        # A window of deliveries keeps the pool fed between acks
+        kwargs={"prefetch_count": 16},
+        daemon=True,
+        name="Consumers",
+    )
+    consumer_thread.start()
 
+    try:
+        consumer_thread.join()
     except KeyboardInterrupt:
         print("\nShutting down workers...")
         client.close()
@@ -0,0 +1,110 @@
+import threading
+from collections import Counter
+
+import pytest
+
+from swarm.coreq import SwarmRabbitMQ
+from swarm.handler import (
+    COMPRESS_THRESHOLD,
+    PERSISTENT_DEFLATE,
+    PERSISTENT_DELIVERY,
+    PERSISTENT_MSGPACK,
+    PERSISTENT_MSGPACK_DEFLATE,
+    RabbitMQHandler,
+    decode_body,
+    json_dumps,
+    msgpack_dumps,
+)
+
+SMALL_MESSAGE = {"role": "user", "content": "hello", "n": 3}
+LARGE_MESSAGE = {"messages": [{"content": "x" * 64}] * 100}
+
+
+def make_handler(use_msgpack=False):
+    # Build a handler without touching a broker: __init__ connects, so
+    # only the codec-related attributes are set up here
+    handler = RabbitMQHandler.__new__(RabbitMQHandler)
+    if use_msgpack:
+        handler._dumps = msgpack_dumps
+        handler.publish_properties = PERSISTENT_MSGPACK
+        handler.compressed_properties = PERSISTENT_MSGPACK_DEFLATE
+    else:
+        handler._dumps = json_dumps
+        handler.publish_properties = PERSISTENT_DELIVERY
+        handler.compressed_properties = PERSISTENT_DEFLATE
+    return handler
+
+
+def make_client():
+    # Same trick for the drain-event logic, which is pure local state
+    client = SwarmRabbitMQ.__new__(SwarmRabbitMQ)
+    client._published = Counter()
+    client._consumed = Counter()
+    client._drained = threading.Event()
+    client._drained.set()
+    return client
+
+
+@pytest.mark.parametrize("use_msgpack", [False, True])
+def test_decode_body_inverts_encode_small(use_msgpack):
+    if use_msgpack and msgpack_dumps is None:
+        pytest.skip("msgpack not installed")
+    handler = make_handler(use_msgpack)
+    body, properties = handler._encode(SMALL_MESSAGE)
+    assert properties is handler.publish_properties
+    assert len(body) <= COMPRESS_THRESHOLD
+    assert decode_body(properties, body) == SMALL_MESSAGE
+
+
+@pytest.mark.parametrize("use_msgpack", [False, True])
+def test_decode_body_inverts_encode_compressed(use_msgpack):
+    if use_msgpack and msgpack_dumps is None:
+        pytest.skip("msgpack not installed")
+    handler = make_handler(use_msgpack)
+    body, properties = handler._encode(LARGE_MESSAGE)
+    assert properties is handler.compressed_properties
+    assert properties.content_encoding == "deflate"
+    # The compressed body must come in under the raw serialization
+    assert len(body) < len(handler._dumps(LARGE_MESSAGE))
+    assert decode_body(properties, body) == LARGE_MESSAGE
+
+
+def test_decode_body_without_properties_is_json():
+    assert decode_body(None, json_dumps(SMALL_MESSAGE)) == SMALL_MESSAGE
+
+
+def test_drain_event_clears_on_publish_and_sets_on_catchup():
+    client = make_client()
+    assert client.wait_until_drained(timeout=0)
+
+    client._note_published("agent_shard_0_queue", 2)
+    assert not client.wait_until_drained(timeout=0)
+
+    client._note_consumed("agent_shard_0_queue")
+    assert not client.wait_until_drained(timeout=0)
+
+    client._note_consumed("agent_shard_0_queue")
+    assert client.wait_until_drained(timeout=0)
+
+
+def test_drain_event_tracks_totals_across_queues():
+    client = make_client()
+    client._note_published("agent_shard_0_queue")
+    client._note_published("agent_shard_1_queue")
+    client._note_consumed("agent_shard_0_queue")
+    assert not client.wait_until_drained(timeout=0)
+    client._note_consumed("agent_shard_1_queue")
+    assert client.wait_until_drained(timeout=0)
+
+    status = client.debug_queues()
+    assert status["agent_shard_0_queue"]["message_count"] == 0
+    assert status["agent_shard_1_queue"]["published"] == 1
+
+
+def test_publish_tally_rolls_back_on_failed_publish():
+    client = make_client()
+    client._note_published("agent_shard_0_queue", 3)
+    assert not client.wait_until_drained(timeout=0)
+    client._unnote_published("agent_shard_0_queue", 3)
+    assert client.wait_until_drained(timeout=0)
+    assert client.debug_queues()["agent_shard_0_queue"]["message_count"] == 0